@@ -6,4 +6,56 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
\ No newline at end of file
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Model provider: "gemini" (live API), "fake" (local stand-in for load testing),
+# "record" (live API, responses saved to LLM_RECORDINGS_DIR) or "replay" (serve saved responses)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_RECORDINGS_DIR = os.getenv("LLM_RECORDINGS_DIR", "recordings")
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "false").lower() == "true"  # sleep for the recorded duration
+LLM_REPLAY_STREAM_CHUNK_SIZE = int(os.getenv("LLM_REPLAY_STREAM_CHUNK_SIZE", "8"))  # characters per replayed chunk
+
+# Fake provider: latency is log-normal around the median (seconds)
+FAKE_LLM_LATENCY_MEDIAN = float(os.getenv("FAKE_LLM_LATENCY_MEDIAN", "1.0"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+FAKE_LLM_STREAM_CHUNK_SIZE = int(os.getenv("FAKE_LLM_STREAM_CHUNK_SIZE", "8"))  # characters per chunk
+FAKE_LLM_STREAM_CHUNK_DELAY = float(os.getenv("FAKE_LLM_STREAM_CHUNK_DELAY", "0.02"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED")
+
+# Admission control for model calls (see scheduler.py)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # calls in flight to the provider
+LLM_QUEUE_DEPTH = int(os.getenv("LLM_QUEUE_DEPTH", "64"))  # waiting calls before rejecting with 429
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "1000"))  # match the Gemini quota
+LLM_BURST = int(os.getenv("LLM_BURST", "20"))
+ENDPOINT_PRIORITIES = {"chat": 0, "projectcode": 1, "updatecode": 1, "analysis": 2, "batch": 2}  # lower runs first
+
+# Deadlines in seconds per endpoint, queue wait included; the call is cancelled and 504 returned after this
+ENDPOINT_DEADLINES = {"chat": 30.0, "projectcode": 90.0, "updatecode": 90.0, "analysis": 90.0, "batch": 90.0}
+# Hedged retries: fire a second request once the first is slower than this latency percentile
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+HEDGE_PERCENTILES = {"chat": 95}  # endpoints missing here are never hedged
+HEDGE_MIN_SAMPLES = 20
+DISCONNECT_POLL_INTERVAL = 0.5  # seconds between client disconnect checks
+
+# Project parsing runs off the event loop (see workers.py)
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "process")  # "process" or "thread"
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", str(os.cpu_count() or 1)))
+PARSE_THREADS = int(os.getenv("PARSE_THREADS", "4"))
+PARSE_INLINE_THRESHOLD = int(os.getenv("PARSE_INLINE_THRESHOLD", "20000"))  # smaller projects (JSON chars) parse inline
+
+# Batch algorithm generation (/batch/projectcode/)
+BATCH_MAX_PROJECTS = int(os.getenv("BATCH_MAX_PROJECTS", "100"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))  # model calls in flight per batch
+
+# Parsed projects kept for /updatecode/ (see project_store.py)
+PROJECT_STORE_SIZE = int(os.getenv("PROJECT_STORE_SIZE", "512"))
+
+# Retrieval (see retriever.py)
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "2"))  # seconds per Qdrant request
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "20"))
+RAG_TIMEOUT = float(os.getenv("RAG_TIMEOUT", "1.5"))  # seconds a chat turn waits for the vector store
+RAG_BREAKER_FAILURES = int(os.getenv("RAG_BREAKER_FAILURES", "3"))  # failures in a row before skipping Qdrant
+RAG_BREAKER_RESET = float(os.getenv("RAG_BREAKER_RESET", "30"))  # seconds before trying Qdrant again
+RAG_FALLBACK = os.getenv("RAG_FALLBACK", "none")  # "none" (no context) or "local" (in-memory index)
+RAG_LOCAL_DOCS_DIR = os.getenv("RAG_LOCAL_DOCS_DIR", "docs")
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from typing import AsyncIterator, Dict, List, Optional, Type, Union
+
+from pydantic import BaseModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+import config
+
+ModelInput = Union[str, List[BaseMessage]]
+
+GEMINI_MODEL = "models/gemini-2.5-flash"
+
+
+def serialize_input(model_input: ModelInput) -> List[Dict[str, str]]:
+    """Turn a prompt string or message list into plain JSON-friendly dicts."""
+    if isinstance(model_input, str):
+        return [{"role": "human", "content": model_input}]
+    return [{"role": msg.type, "content": msg.content} for msg in model_input]
+
+
+def input_digest(model_input: ModelInput, *parts: str) -> str:
+    """Stable hash of a model input plus any extra key parts (model name, schema)."""
+    payload = json.dumps([serialize_input(model_input), *parts], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def split_chunks(text: str, size: int) -> List[str]:
+    size = max(size, 1)
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class FakeChatModel:
+    """Local stand-in for a chat model, used to load test the service without the Gemini API.
+
+    Replies are deterministic for a given input. Latency is drawn from a log-normal
+    distribution around `latency_median`, and `astream` emits the reply in fixed-size
+    chunks after the first-token latency.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            latency_median: float,
+            latency_sigma: float,
+            stream_chunk_size: int,
+            stream_chunk_delay: float,
+            seed: Optional[str] = None,
+            schema: Optional[Type[BaseModel]] = None,
+            rng: Optional[random.Random] = None
+    ):
+        self.name = name
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.stream_chunk_size = stream_chunk_size
+        self.stream_chunk_delay = stream_chunk_delay
+        self.seed = seed
+        self.schema = schema
+        self.rng = rng or random.Random(seed)
+
+    def with_structured_output(self, schema: Type[BaseModel]) -> "FakeChatModel":
+        return FakeChatModel(
+            self.name, self.latency_median, self.latency_sigma, self.stream_chunk_size,
+            self.stream_chunk_delay, self.seed, schema, self.rng
+        )
+
+    def _latency(self) -> float:
+        if self.latency_median <= 0:
+            return 0.0
+        return self.latency_median * math.exp(self.rng.gauss(0, self.latency_sigma))
+
+    def _reply(self, model_input: ModelInput) -> str:
+        digest = input_digest(model_input, self.name)[:8]
+        return f"[{self.name} {digest}] That sounds interesting! What part of your project are you most proud of?"
+
+    def _result(self, model_input: ModelInput):
+        text = self._reply(model_input)
+        if self.schema is None:
+            return AIMessage(content=text)
+        return self.schema(**{field: f"{field}: {text}" for field in self.schema.model_fields})
+
+    def invoke(self, model_input: ModelInput):
+        time.sleep(self._latency())
+        return self._result(model_input)
+
+    async def ainvoke(self, model_input: ModelInput):
+        await asyncio.sleep(self._latency())
+        return self._result(model_input)
+
+    async def astream(self, model_input: ModelInput) -> AsyncIterator[AIMessageChunk]:
+        await asyncio.sleep(self._latency())
+        for chunk in split_chunks(self._reply(model_input), self.stream_chunk_size):
+            yield AIMessageChunk(content=chunk)
+            await asyncio.sleep(self.stream_chunk_delay)
+
+
+class RecordReplayChatModel:
+    """Wraps a chat model and saves request/response pairs to disk ("record"),
+    or serves previously saved responses without calling the model ("replay").
+
+    Recordings are one JSON file per request, keyed by a hash of the model name,
+    structured output schema and input messages.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            directory: str,
+            mode: str,
+            inner=None,
+            schema: Optional[Type[BaseModel]] = None,
+            replay_latency: bool = False,
+            stream_chunk_size: int = 8
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Record mode needs a model to record from")
+        self.name = name
+        self.directory = directory
+        self.mode = mode
+        self.inner = inner
+        self.schema = schema
+        self.replay_latency = replay_latency
+        self.stream_chunk_size = stream_chunk_size
+
+    def with_structured_output(self, schema: Type[BaseModel]) -> "RecordReplayChatModel":
+        inner = self.inner.with_structured_output(schema) if self.inner is not None else None
+        return RecordReplayChatModel(
+            self.name, self.directory, self.mode, inner, schema, self.replay_latency, self.stream_chunk_size
+        )
+
+    def _path(self, model_input: ModelInput) -> str:
+        schema_name = self.schema.__name__ if self.schema else ""
+        return os.path.join(self.directory, f"{input_digest(model_input, self.name, schema_name)}.json")
+
+    def _save(self, path: str, model_input: ModelInput, result, elapsed: float):
+        if isinstance(result, BaseModel):
+            output = result.model_dump()
+        else:
+            output = {"content": result.content}
+        record = {
+            "model": self.name,
+            "schema": self.schema.__name__ if self.schema else None,
+            "input": serialize_input(model_input),
+            "output": output,
+            "elapsed": elapsed
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        # Unique temp file: several workers may record the same request at once
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            raise LookupError(f"No recording for this request ({os.path.basename(path)})")
+        output = record["output"]
+        result = self.schema(**output) if self.schema else AIMessage(content=output["content"])
+        return result, record.get("elapsed", 0.0)
+
+    def invoke(self, model_input: ModelInput):
+        path = self._path(model_input)
+        if self.mode == "replay":
+            result, elapsed = self._load(path)
+            if self.replay_latency:
+                time.sleep(elapsed)
+            return result
+        started = time.monotonic()
+        result = self.inner.invoke(model_input)
+        self._save(path, model_input, result, time.monotonic() - started)
+        return result
+
+    async def ainvoke(self, model_input: ModelInput):
+        path = self._path(model_input)
+        if self.mode == "replay":
+            result, elapsed = self._load(path)
+            if self.replay_latency:
+                await asyncio.sleep(elapsed)
+            return result
+        started = time.monotonic()
+        result = await self.inner.ainvoke(model_input)
+        self._save(path, model_input, result, time.monotonic() - started)
+        return result
+
+    async def astream(self, model_input: ModelInput) -> AsyncIterator[AIMessageChunk]:
+        path = self._path(model_input)
+        if self.mode == "replay":
+            result, elapsed = self._load(path)
+            if self.replay_latency:
+                await asyncio.sleep(elapsed)
+            for chunk in split_chunks(result.content, self.stream_chunk_size):
+                yield AIMessageChunk(content=chunk)
+            return
+        started = time.monotonic()
+        parts = []
+        async for chunk in self.inner.astream(model_input):
+            parts.append(chunk.content)
+            yield chunk
+        self._save(path, model_input, AIMessage(content="".join(parts)), time.monotonic() - started)
+
+
+def create_llm(name: str, thinking_budget: int):
+    """Build the chat model for `name` using the provider selected by config.LLM_PROVIDER."""
+    provider = config.LLM_PROVIDER
+
+    if provider == "fake":
+        return FakeChatModel(
+            name,
+            latency_median=config.FAKE_LLM_LATENCY_MEDIAN,
+            latency_sigma=config.FAKE_LLM_LATENCY_SIGMA,
+            stream_chunk_size=config.FAKE_LLM_STREAM_CHUNK_SIZE,
+            stream_chunk_delay=config.FAKE_LLM_STREAM_CHUNK_DELAY,
+            seed=f"{config.FAKE_LLM_SEED}:{name}" if config.FAKE_LLM_SEED is not None else None
+        )
+
+    if provider == "replay":
+        return RecordReplayChatModel(
+            name,
+            config.LLM_RECORDINGS_DIR,
+            "replay",
+            replay_latency=config.LLM_REPLAY_LATENCY,
+            stream_chunk_size=config.LLM_REPLAY_STREAM_CHUNK_SIZE
+        )
+
+    if provider not in ("gemini", "record"):
+        raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
+
+    model = ChatGoogleGenerativeAI(
+        model=GEMINI_MODEL,
+        google_api_key=config.GOOGLE_API_KEY,
+        temperature=0.7,
+        thinking_budget=thinking_budget
+    )
+
+    if provider == "record":
+        return RecordReplayChatModel(name, config.LLM_RECORDINGS_DIR, "record", inner=model)
+    return model
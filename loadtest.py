@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+# Drives concurrent sessions against a running server. Start the server with
+# LLM_PROVIDER=fake (or replay) so the numbers measure the service, not Gemini.
+#
+#   LLM_PROVIDER=fake uvicorn main:app --workers 2
+#   python loadtest.py --sessions 1000 --concurrency 200
+
+sample_project = [
+    [0, ["start", {"id": 1, "xcor": 0, "ycor": 0, "heading": 0, "color": 0, "shade": 50, "pensize": 5, "grey": 100}], 250, 150, [None, 1, None]],
+    [1, "newnote", 0, 0, [0, 2, 3, None]],
+    [2, "divide", 0, 0, [1, 4, 5]],
+    [3, "pitch", 0, 0, [1, 6, 7, None]],
+    [4, ["number", {"value": 1}], 0, 0, [2]],
+    [5, ["number", {"value": 4}], 0, 0, [2]],
+    [6, ["solfege", {"value": "sol"}], 0, 0, [3]],
+    [7, ["number", {"value": 4}], 0, 0, [3]]
+]
+
+
+async def run_session(client, session_id, turns, project, latencies, errors):
+    async def timed(endpoint, payload):
+        started = time.monotonic()
+        try:
+            response = await client.post(endpoint, json=payload)
+            # Overload errors may come back as plain text (uvicorn 500, proxy 502/503)
+            if response.status_code != 200:
+                errors.append((endpoint, response.status_code))
+                return {}
+            body = response.json()
+            if "error" in body:
+                errors.append((endpoint, response.status_code))
+            return body
+        except (httpx.HTTPError, ValueError) as e:
+            errors.append((endpoint, type(e).__name__))
+            return {}
+        finally:
+            latencies.setdefault(endpoint, []).append(time.monotonic() - started)
+
+    code = json.dumps(project)
+    answer = await timed("/projectcode/", {"code": code})
+    algorithm = answer.get("algorithm", "")
+    messages = []
+    for turn in range(turns):
+        query = f"Session {session_id}, turn {turn}: I made a melody with a loop."
+        reply = await timed("/chat/", {"query": query, "messages": messages, "mentor": "meta", "algorithm": algorithm})
+        messages += [{"role": "user", "content": query}, {"role": "meta", "content": reply.get("response", "")}]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def main(args):
+    project = sample_project
+    if args.project:
+        with open(args.project, "r", encoding="utf-8") as f:
+            project = json.load(f)
+
+    latencies, errors = {}, []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        async def bounded(session_id):
+            async with semaphore:
+                await run_session(client, session_id, args.turns, project, latencies, errors)
+
+        started = time.monotonic()
+        await asyncio.gather(*(bounded(i) for i in range(args.sessions)))
+        elapsed = time.monotonic() - started
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), {len(errors)} errors")
+    for endpoint, values in latencies.items():
+        print(
+            f"{endpoint:15} n={len(values):6} mean={statistics.mean(values):.3f}s "
+            f"p50={percentile(values, 50):.3f}s p95={percentile(values, 95):.3f}s p99={percentile(values, 99):.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the reflection backend")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per session")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--project", help="path to a Music Blocks project JSON file")
+    asyncio.run(main(parser.parse_args()))
@@ -1,20 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from fastapi.middleware.cors import CORSMiddleware
 
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_huggingface import HuggingFaceEmbeddings
 
 import config
 import json
-from utils.prompts import mentor_config, general_instructions, generateAlgorithmPrompt, updateAlgorithmPrompt, generateAnalysis
-from utils.parser import convert_music_blocks
-from utils.blocks import findBlockInfo
-from retriever import getContext
+import asyncio
+from contextlib import asynccontextmanager
+from utils.prompts import mentor_config, generateAlgorithmPrompt, updateAlgorithmPrompt, generateAnalysis
+from retriever import getContext, start_local_index
+from llm import create_llm
+from scheduler import ModelScheduler, ModelCallError, ClientDisconnected
+import workers
+from project_store import ProjectStore, content_hash
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_local_index()
+    yield
+    workers.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,21 +37,23 @@ app.add_middleware(
 embeddings = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
 
 # Chat endpoint: thinking disabled for faster, conversational responses
-llm = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-flash",
-    google_api_key=config.GOOGLE_API_KEY,
-    temperature=0.7,
-    thinking_budget=0  # Disable thinking for chat
-)
+llm = create_llm("chat", thinking_budget=0)  # Disable thinking for chat
 
 # Algorithm & analysis endpoints: thinking enabled for deeper reasoning
-reasoning_llm = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-flash",
-    google_api_key=config.GOOGLE_API_KEY,
-    temperature=0.7,
-    thinking_budget=-1  # Dynamic thinking (model decides)
+reasoning_llm = create_llm("reasoning", thinking_budget=-1)  # Dynamic thinking (model decides)
+
+# Every model call goes through the scheduler: priority queue + rate limit + fast 429 when full
+scheduler = ModelScheduler(
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    max_queue_depth=config.LLM_QUEUE_DEPTH,
+    requests_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+    burst=config.LLM_BURST,
+    priorities=config.ENDPOINT_PRIORITIES
 )
 
+# Last parsed projects, so /updatecode/ can skip re-parsing the old code
+project_store = ProjectStore(config.PROJECT_STORE_SIZE)
+
 # request schemas
 class QueryRequest(BaseModel):
     query: str
@@ -57,8 +69,16 @@ class AnalysisRequest(BaseModel):
     summary: str
 
 class CodeUpdateRequest(BaseModel):
-    oldcode: str
     newcode: str
+    oldcode: Optional[str] = None
+    oldhash: Optional[str] = None  # "hash" from the previous /projectcode/ or /updatecode/ response
+
+class BatchProject(BaseModel):
+    id: str
+    code: str
+
+class BatchCodeRequest(BaseModel):
+    projects: List[BatchProject]
 
 # response schemas
 class AnalysisSchema(BaseModel):
@@ -74,51 +94,81 @@ async def root():
     return {"message": "Hello, Music Blocks!"}    
 
 @app.post("/projectcode/")
-async def projectcode(request: CodeRequest):
+async def projectcode(request: CodeRequest, http_request: Request):
     code = request.code
-    data = json.loads(code)
-    flowchart = convert_music_blocks(data)
-    blockInfo = findBlockInfo(flowchart)
+    codeHash = content_hash(code)
+    project = project_store.get(codeHash) or await workers.parse(code, codeHash)
+    project_store.put(project)
+    flowchart, blockInfo = project.flowchart, project.block_info
     structured_llm = reasoning_llm.with_structured_output(AlgorithmSchema)
-    answer = structured_llm.invoke(generateAlgorithmPrompt(flowchart, blockInfo))
     
     try:
+        answer = await call_model(
+            http_request, "projectcode", lambda: structured_llm.ainvoke(generateAlgorithmPrompt(flowchart, blockInfo))
+        )
         return {
             "algorithm": answer.algorithm,
-            "response" : answer.response
+            "response" : answer.response,
+            "hash": project.hash
         }
+    except ModelCallError as e:
+        return error_response(e)
     except Exception as e:
         return {"error": str(e)}
     
 @app.post("/updatecode/")
-async def update_projectcode(request: CodeUpdateRequest):
+async def update_projectcode(request: CodeUpdateRequest, http_request: Request):
     oldCode = request.oldcode
     newCode = request.newcode
+    newHash = content_hash(newCode)
+    # The store is only ever keyed by hashes computed here; a client-sent oldhash is just a lookup key
+    oldHash = content_hash(oldCode) if oldCode is not None else request.oldhash
 
-    newFlowchart = convert_music_blocks(json.loads(newCode))
-    oldFlowchart = convert_music_blocks(json.loads(oldCode))
+    oldProject = project_store.get(oldHash)
+    newProject = project_store.get(newHash)
+    if oldProject is None:
+        if oldCode is None:
+            return JSONResponse(status_code=409, content={"error": "Unknown oldhash, send oldcode instead"})
+        if newProject is None:
+            oldProject, newProject = await asyncio.gather(
+                workers.parse(oldCode, oldHash), workers.parse(newCode, newHash)
+            )
+        else:
+            oldProject = await workers.parse(oldCode, oldHash)
+    elif newProject is None:
+        # Only stacks that changed since the old version are re-rendered
+        newProject = await workers.parse(newCode, newHash, previous=oldProject)
+
+    project_store.put(oldProject)
+    project_store.put(newProject)
+    oldFlowchart, newFlowchart, blockInfo = oldProject.flowchart, newProject.flowchart, newProject.block_info
 
     if (newFlowchart == oldFlowchart):
         print("No change detected")
         return {
             "algorithm": "unchanged",
-            "response" : "No change detected"
+            "response" : "No change detected",
+            "hash": newProject.hash
         }
 
-    blockInfo = findBlockInfo(newFlowchart)
     structured_llm = reasoning_llm.with_structured_output(AlgorithmSchema)
-    answer = structured_llm.invoke(updateAlgorithmPrompt(oldFlowchart, newFlowchart, blockInfo))
     
     try:
+        answer = await call_model(
+            http_request, "updatecode", lambda: structured_llm.ainvoke(updateAlgorithmPrompt(oldFlowchart, newFlowchart, blockInfo))
+        )
         return {
             "algorithm": answer.algorithm,
-            "response" : answer.response
+            "response" : answer.response,
+            "hash": newProject.hash
         }
+    except ModelCallError as e:
+        return error_response(e)
     except Exception as e:
         return {"error": str(e)}
 
 @app.post("/chat/")
-async def chat(request: QueryRequest):
+async def chat(request: QueryRequest, http_request: Request):
     query = request.query.strip()
     raw_messages = request.messages
     mentor = request.mentor.lower()
@@ -127,33 +177,36 @@ async def chat(request: QueryRequest):
     if not query:
         return {"error": "Empty query"}
 
+    # Retrieval runs while the messages and system prompt are assembled
+    context_task = asyncio.ensure_future(getContext(query))
+
     messages: List[BaseMessage] = convert_messages(raw_messages)
-     
-    # Replace or insert system prompt
-    system_prompt = mentor_config(general_instructions, algorithm, mentor)
-    
     if messages and isinstance(messages[0], SystemMessage):
-        messages[0] = SystemMessage(content=system_prompt)
-    else:
-        messages.insert(0, SystemMessage(content=system_prompt))
+        messages.pop(0)
 
-    # Add relevant context from RAG
-    rag_context = getContext(query)
+    # Static mentor prompt first, then the session's algorithm, history and this turn,
+    # so consecutive requests share the longest possible prefix (Gemini caches it implicitly)
+    messages.insert(0, SystemMessage(content=mentor_config(algorithm, mentor)))
+
+    # Add relevant context from RAG, after the history since it changes every turn
+    rag_context = await context_task
     if rag_context:
-        messages.insert(1, HumanMessage(content=f"Relevant context:\n{rag_context}"))
+        messages.append(HumanMessage(content=f"Relevant context:\n{rag_context}"))
 
     messages.append(HumanMessage(content=query))
 
     try:
-        result = llm.invoke(messages) #invoking llm with messages, not a single query
+        result = await call_model(http_request, "chat", lambda: llm.ainvoke(messages)) #invoking llm with messages, not a single query
         return {
             "response": result.content
         }
+    except ModelCallError as e:
+        return error_response(e)
     except Exception as e:
         return {"error": str(e)}
     
 @app.post("/analysis/")
-async def analysis(request: AnalysisRequest):
+async def analysis(request: AnalysisRequest, http_request: Request):
     raw_messages = request.messages
     old_summary = request.summary
     structured_llm = llm.with_structured_output(AnalysisSchema)
@@ -162,13 +215,112 @@ async def analysis(request: AnalysisRequest):
         return {"error": "Empty query"}
     
     try:
-        result = structured_llm.invoke(generateAnalysis(old_summary, raw_messages))
+        result = await call_model(
+            http_request, "analysis", lambda: structured_llm.ainvoke(generateAnalysis(old_summary, raw_messages))
+        )
         return {
             "response": result.response
         }
+    except ModelCallError as e:
+        return error_response(e)
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/batch/projectcode/")
+async def batch_projectcode(request: BatchCodeRequest):
+    projects = request.projects
+
+    if not projects:
+        return {"error": "No projects"}
+    if len(projects) > config.BATCH_MAX_PROJECTS:
+        return {"error": f"Too many projects (max {config.BATCH_MAX_PROJECTS})"}
+
+    return StreamingResponse(stream_batch(projects), media_type="application/x-ndjson")
+
+async def stream_batch(projects: List[BatchProject]):
+    """Yield one NDJSON line per project as its algorithm becomes ready.
+
+    Projects are parsed in parallel like /projectcode/ (same executor and project
+    store), projects with identical flowcharts share one model call, and at most
+    BATCH_MAX_CONCURRENCY calls run at once. Each line carries the project's
+    "hash" for a later /updatecode/.
+    """
+    async def parse(code: str):
+        codeHash = content_hash(code)
+        return project_store.get(codeHash) or await workers.parse(code, codeHash)
+
+    parsed = await asyncio.gather(*(parse(project.code) for project in projects), return_exceptions=True)
+
+    groups: Dict[tuple, List[str]] = {}
+    block_infos: Dict[tuple, str] = {}
+    hashes: Dict[str, str] = {}
+    for project, result in zip(projects, parsed):
+        if isinstance(result, Exception):
+            yield json.dumps({"id": project.id, "error": str(result)}) + "\n"
+        else:
+            project_store.put(result)
+            hashes[project.id] = result.hash
+            flowchart = tuple(result.flowchart)
+            groups.setdefault(flowchart, []).append(project.id)
+            block_infos[flowchart] = result.block_info
+
+    structured_llm = reasoning_llm.with_structured_output(AlgorithmSchema)
+    semaphore = asyncio.Semaphore(config.BATCH_MAX_CONCURRENCY)
+
+    async def generate(flowchart: List[str], blockInfo: str):
+        async with semaphore:
+            return await scheduler.call(
+                "batch",
+                lambda: structured_llm.ainvoke(generateAlgorithmPrompt(flowchart, blockInfo)),
+                deadline=config.ENDPOINT_DEADLINES.get("batch")
+            )
+
+    tasks = {
+        asyncio.ensure_future(generate(list(flowchart), block_infos[flowchart])): ids
+        for flowchart, ids in groups.items()
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    answer = task.result()
+                    result = {"algorithm": answer.algorithm, "response": answer.response}
+                except Exception as e:
+                    result = {"error": str(e)}
+                for project_id in tasks[task]:
+                    yield json.dumps({"id": project_id, **result, "hash": hashes[project_id]}) + "\n"
+    finally:
+        # Client went away or the stream was closed early
+        for task in pending:
+            task.cancel()
+
+async def call_model(http_request: Request, endpoint: str, call):
+    """Run a model call through the scheduler with the endpoint's deadline,
+    cancelling it if the client disconnects before the answer is ready."""
+    hedge_percentile = config.HEDGE_PERCENTILES.get(endpoint) if config.LLM_HEDGING else None
+    task = asyncio.ensure_future(scheduler.call(
+        endpoint,
+        call,
+        deadline=config.ENDPOINT_DEADLINES.get(endpoint),
+        hedge_percentile=hedge_percentile,
+        hedge_min_samples=config.HEDGE_MIN_SAMPLES
+    ))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                print(f"Client disconnected, cancelling {endpoint} call")
+                raise ClientDisconnected("Client disconnected")
+    finally:
+        task.cancel()
+
+def error_response(e: ModelCallError) -> JSONResponse:
+    return JSONResponse(status_code=e.status_code, content={"error": str(e)}, headers=e.headers)
+
 def convert_messages(raw_messages: List[Dict[str, str]]) -> List[BaseMessage]:
     converted = []
     for msg in raw_messages:
@@ -0,0 +1,43 @@
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from utils.parser import Segments
+
+
+@dataclass
+class ParsedProject:
+    """A parsed project, kept so later updates can reuse its rendered stacks."""
+    hash: str
+    flowchart: List[str]
+    block_info: str
+    stacks: Dict[str, Segments]
+
+
+def content_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class ProjectStore:
+    """Least-recently-used store of parsed projects, keyed by content hash.
+
+    Lives in the server process, so with several uvicorn workers a lookup can miss;
+    callers then fall back to parsing the full code.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.projects: "OrderedDict[str, ParsedProject]" = OrderedDict()
+
+    def get(self, project_hash: Optional[str]) -> Optional[ParsedProject]:
+        project = self.projects.get(project_hash)
+        if project is not None:
+            self.projects.move_to_end(project_hash)
+        return project
+
+    def put(self, project: ParsedProject):
+        self.projects[project.hash] = project
+        self.projects.move_to_end(project.hash)
+        while len(self.projects) > self.max_size:
+            self.projects.popitem(last=False)
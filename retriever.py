@@ -1,33 +1,150 @@
+import asyncio
+import os
+import time
+
+import httpx
 import config
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from qdrant_client import AsyncQdrantClient
 
 embeddings = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
 
-qdrant = QdrantClient(
+# Async client with a keep-alive connection pool, so a chat turn never blocks the event loop on Qdrant
+qdrant = AsyncQdrantClient(
     url=config.QDRANT_URL,
     api_key=config.QDRANT_API_KEY,
+    prefer_grpc=config.QDRANT_PREFER_GRPC,
+    timeout=config.QDRANT_TIMEOUT,
+    limits=httpx.Limits(
+        max_connections=config.QDRANT_POOL_SIZE,
+        max_keepalive_connections=config.QDRANT_POOL_SIZE
+    )
 )
 
-vectorstore = QdrantVectorStore(
-    client=qdrant,
-    collection_name="mb_docs",
-    embedding=embeddings
-)
-
+collection_name = "mb_docs"
 relevance_threshold = 0.3  # distance metric, so lower is more relevant
+top_k = 3
+
+
+class CircuitBreaker:
+    """Stops calling the vector store after repeated failures.
+
+    After `failure_threshold` failures in a row the breaker opens and calls are
+    skipped. Once `reset_timeout` seconds have passed, one trial call is let
+    through; success closes the breaker, failure keeps it open.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.opened_at = time.monotonic()  # hold other calls back while the trial call runs
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(config.RAG_BREAKER_FAILURES, config.RAG_BREAKER_RESET)
+
+local_index = None
+local_index_task = None
+
+
+def build_local_index():
+    """In-memory index over the docs that ingest.py uploads, used while Qdrant is down."""
+    docs_dir = config.RAG_LOCAL_DOCS_DIR
+    raw_docs = []
+    for filename in os.listdir(docs_dir):
+        if filename.endswith(".txt") or filename.endswith(".md"):
+            with open(os.path.join(docs_dir, filename), "r", encoding="utf-8") as f:
+                content = f.read().strip()
+                if content:
+                    raw_docs.append(Document(page_content=content, metadata={"source": filename}))
+
+    if not raw_docs:
+        print(f"No documents in '{docs_dir}', local retrieval fallback disabled")
+        return InMemoryVectorStore(embeddings)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=30)
+    return InMemoryVectorStore.from_documents(splitter.split_documents(raw_docs), embeddings)
+
+
+async def load_local_index():
+    global local_index
+    try:
+        local_index = await asyncio.to_thread(build_local_index)
+    except Exception as e:
+        print(f"Could not build local retrieval index: {e}")
+
+
+def start_local_index():
+    """Build the fallback index in the background, so no chat turn waits for it."""
+    global local_index_task
+    if config.RAG_FALLBACK == "local" and local_index_task is None:
+        local_index_task = asyncio.ensure_future(load_local_index())
+
+
+async def search_qdrant(vector):
+    response = await qdrant.query_points(collection_name, query=vector, limit=top_k, with_payload=True)
+    return [(point.payload.get("page_content", ""), point.score) for point in response.points]
+
+
+async def search_fallback(vector):
+    # Nothing to fall back on until the background build has finished
+    if config.RAG_FALLBACK != "local" or local_index is None:
+        return []
+
+    results = await asyncio.to_thread(local_index.similarity_search_with_score_by_vector, vector, top_k)
+    return [(doc.page_content, score) for doc, score in results]
+
+
+async def getContext(query):
+    vector = await asyncio.to_thread(embeddings.embed_query, query)
+
+    # Qdrant and the fallback share one RAG_TIMEOUT budget
+    deadline = time.monotonic() + config.RAG_TIMEOUT
+
+    results = None
+    if breaker.allow():
+        try:
+            results = await asyncio.wait_for(search_qdrant(vector), config.RAG_TIMEOUT)
+            breaker.record_success()
+        except Exception as e:
+            breaker.record_failure()
+            print(f"Vector store unavailable ({type(e).__name__}: {e}), using fallback")
+
+    if results is None:
+        try:
+            results = await asyncio.wait_for(search_fallback(vector), max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            print(f"Local retrieval failed: {e}")
+            results = []
+
+    relevant_docs = [(content, score) for content, score in results if score > relevance_threshold]
 
-def getContext(query):
-    results = vectorstore.similarity_search_with_score(query, k=3)
-    relevant_docs = [(doc, score) for doc, score in results if score > relevance_threshold]
-    
     print("Scores:", [score for _, score in results])
-    
+
     if relevant_docs:
-        rag_context = " ".join(doc.page_content for doc, _ in relevant_docs)
+        rag_context = " ".join(content for content, _ in relevant_docs)
         return rag_context
     else:
         return None
 
-#print(getContext("i made the golden spiral"))
\ No newline at end of file
+#print(asyncio.run(getContext("i made the golden spiral")))
@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class ModelCallError(Exception):
+    """A model call that was not answered; carries the HTTP status to report."""
+    status_code = 503
+
+    def __init__(self, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.headers = headers or {}
+
+
+class QueueFullError(ModelCallError):
+    """Raised when a model call is rejected because the wait queue is full."""
+    status_code = 429
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server is busy, retry after {retry_after}s", {"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(ModelCallError):
+    """Raised when a model call (including its queue wait) runs past its deadline."""
+    status_code = 504
+
+
+class ClientDisconnected(ModelCallError):
+    """Raised when the HTTP client went away and the model call was cancelled."""
+    status_code = 499
+
+
+class TokenBucket:
+    """Request rate limiter: refills `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies per endpoint."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+
+    def record(self, endpoint: str, seconds: float):
+        self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, endpoint: str, p: float, min_samples: int) -> Optional[float]:
+        """The p-th percentile latency, or None until `min_samples` calls were seen."""
+        samples = self.samples.get(endpoint)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def mean(self) -> Optional[float]:
+        """Mean latency over the recent calls of all endpoints, or None before the first call."""
+        total = sum(sum(samples) for samples in self.samples.values())
+        count = sum(len(samples) for samples in self.samples.values())
+        return total / count if count else None
+
+
+class ModelScheduler:
+    """Admission control in front of the model clients.
+
+    Calls wait in a bounded priority queue (lower number runs first) and are
+    released when both a concurrency slot and a rate-limit token are free.
+    When the queue is full new calls fail fast with QueueFullError instead of
+    piling up behind the provider's own rate limit.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int,
+            max_queue_depth: int,
+            requests_per_minute: float,
+            burst: int,
+            priorities: Dict[str, int]
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.priorities = priorities
+        self.default_priority = max(priorities.values(), default=0) + 1
+        self.queue: List[Tuple[int, int, asyncio.Future]] = []
+        self.order = itertools.count()
+        self.active = 0
+        self.waiting = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.latency = LatencyTracker()
+
+    def retry_after(self) -> int:
+        """Rough estimate of how long the queued calls take to drain.
+
+        The queue drains at the rate limit or at max_concurrency / mean latency,
+        whichever is slower; the rate limit alone is the lower bound.
+        """
+        throughput = self.bucket.rate
+        mean_latency = self.latency.mean()
+        if mean_latency:
+            throughput = min(throughput, self.max_concurrency / mean_latency)
+        return max(1, math.ceil(self.waiting / self.bucket.rate), math.ceil(self.waiting / throughput))
+
+    def _evict(self, priority: int) -> bool:
+        """Make room for a call of `priority` by rejecting the newest waiting call of
+        lower priority (higher number). False if there is none."""
+        entries = [entry for entry in self.queue if not entry[2].done()]
+        if not entries:
+            return False
+        victim = max(entries, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= priority:
+            return False
+        self.queue.remove(victim)
+        heapq.heapify(self.queue)
+        self.waiting -= 1
+        victim[2].set_exception(QueueFullError(self.retry_after()))
+        return True
+
+    async def run(self, endpoint: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Wait for admission, then await `call()` while holding a slot.
+
+        When the queue is full, a lower-priority waiting call is rejected to make
+        room; only if there is none is this call rejected.
+        """
+        priority = self.priorities.get(endpoint, self.default_priority)
+        if self.waiting >= self.max_queue_depth and not self._evict(priority):
+            raise QueueFullError(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (priority, next(self.order), future))
+        self.waiting += 1
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self.waiting -= 1
+            elif future.exception() is None:
+                # Admitted, but cancelled before we could start the call
+                self._release()
+            raise
+
+        # Latency is measured from admission, so queue wait does not feed the hedge trigger
+        started = time.monotonic()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # Hedge losers and deadline overruns: the elapsed time is only a lower bound,
+            # but leaving them out would bias the percentile towards the fast winners
+            self.latency.record(endpoint, time.monotonic() - started)
+            raise
+        finally:
+            self._release()
+        self.latency.record(endpoint, time.monotonic() - started)
+        return result
+
+    async def call(
+            self,
+            endpoint: str,
+            call: Callable[[], Awaitable[T]],
+            deadline: Optional[float] = None,
+            hedge_percentile: Optional[float] = None,
+            hedge_min_samples: int = 20
+    ) -> T:
+        """Run `call()` through the queue with a deadline (seconds, queue wait included).
+
+        With `hedge_percentile`, a second attempt is started once the first has taken
+        longer than that percentile of recent latencies, unless other calls are
+        already waiting in the queue; the first answer wins and the other attempt
+        is cancelled.
+        """
+        hedge_after = None
+        if hedge_percentile is not None:
+            hedge_after = self.latency.percentile(endpoint, hedge_percentile, hedge_min_samples)
+
+        try:
+            return await asyncio.wait_for(self._hedged(endpoint, call, hedge_after), deadline)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Model call took longer than {deadline}s")
+
+    async def _hedged(self, endpoint: str, call: Callable[[], Awaitable[T]], hedge_after: Optional[float]) -> T:
+        attempts = [asyncio.ensure_future(self.run(endpoint, call))]
+        pending = set(attempts)
+        hedging = hedge_after is not None
+        try:
+            while True:
+                timeout = hedge_after if hedging and len(attempts) == 1 else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self.waiting > 0:
+                        # Calls are already queueing; a hedge would only add to the overload
+                        hedging = False
+                        continue
+                    attempts.append(asyncio.ensure_future(self.run(endpoint, call)))
+                    pending.add(attempts[-1])
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    return done.pop().result()
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.queue and self.active < self.max_concurrency:
+            future = self.queue[0][2]
+            if future.cancelled():
+                heapq.heappop(self.queue)
+                continue
+
+            delay = self.bucket.delay()
+            if delay > 0:
+                if self.timer is None:
+                    self.timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+
+            heapq.heappop(self.queue)
+            self.bucket.take()
+            self.waiting -= 1
+            self.active += 1
+            future.set_result(None)
+
+    def _on_timer(self):
+        self.timer = None
+        self._dispatch()
@@ -1,6 +1,13 @@
 import re
 import json
-from typing import Dict, List, Set, Union, Optional
+import hashlib
+from typing import Dict, List, Set, Tuple, Union, Optional
+
+# Boilerplate lines from the Reflection widget's own blocks
+REMOVED_LINES = {"├── Reflection", '├── Print: ""', '│   ├── "Reflective Learning"'}
+
+# A rendered stack: (id of the block each top-level pass started from, lines it produced)
+Segments = List[Tuple[Optional[str], List[str]]]
 
 
 def is_base64_data(s: str) -> bool:
@@ -348,7 +355,104 @@ def convert_music_blocks(data: Union[List, Dict]) -> List[str]:
             if block_type not in ["hidden", "vspace"] and block_id != root_block[0]:
                 output_lines.extend(process_block(block, block_map, visited, 1))
                 
-    to_remove = {"├── Reflection", '├── Print: ""', '│   ├── "Reflective Learning"'}
-    cleaned = [line for line in output_lines if line not in to_remove]
+    cleaned = [line for line in output_lines if line not in REMOVED_LINES]
                 
-    return cleaned
\ No newline at end of file
+    return cleaned
+
+
+def get_block_type(block: List) -> str:
+    return block[1][0] if isinstance(block[1], list) else block[1]
+
+
+def group_stacks(data: List) -> List[List[List]]:
+    """Split blocks into connected stacks, each listed in project order.
+
+    Blocks are connected if either one lists the other in its connections, so a
+    stack holds every block that rendering any of its members can reach.
+    """
+    parent = {block[0]: block[0] for block in data}
+
+    def find(block_id):
+        while parent[block_id] != block_id:
+            parent[block_id] = parent[parent[block_id]]
+            block_id = parent[block_id]
+        return block_id
+
+    for block in data:
+        connections = block[-1] if isinstance(block[-1], list) else []
+        for other_id in connections:
+            if other_id is not None and other_id in parent:
+                parent[find(other_id)] = find(block[0])
+
+    stacks: Dict[str, List[List]] = {}
+    for block in data:
+        stacks.setdefault(find(block[0]), []).append(block)
+    return list(stacks.values())
+
+
+def stack_key(blocks: List[List], has_root: bool) -> str:
+    """Content hash of a stack: changes when any block ID, argument or connection changes."""
+    payload = json.dumps([has_root, blocks], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_stack(blocks: List[List], block_map: Dict, root_id) -> Segments:
+    """Render one stack the way convert_music_blocks would, one segment per top-level pass."""
+    visited = set()
+    segments = []
+
+    if any(block[0] == root_id for block in blocks):
+        segments.append((None, process_block(block_map[root_id], block_map, visited, 1)))
+
+    for block in blocks:
+        block_id = block[0]
+        if block_id not in visited:
+            if get_block_type(block) not in ["hidden", "vspace"] and block_id != root_id:
+                segments.append((block_id, process_block(block, block_map, visited, 1)))
+    return segments
+
+
+def convert_music_blocks_incremental(
+        data: Union[List, Dict],
+        previous_stacks: Optional[Dict[str, Segments]] = None
+) -> Tuple[List[str], Dict[str, Segments]]:
+    """Like convert_music_blocks, but reuses stacks rendered for a previous version.
+
+    Returns the text representation and the rendered stacks keyed by stack_key,
+    to pass back in on the next update. Only stacks whose blocks changed are rendered.
+    """
+    if not isinstance(data, list) or len(data) == 0:
+        return convert_music_blocks(data), {}
+
+    block_map = {block[0]: block for block in data}
+    if len(block_map) != len(data):
+        # Duplicate block IDs: stacks are ambiguous, render everything
+        return convert_music_blocks(data), {}
+
+    previous_stacks = previous_stacks or {}
+    root_block = next((block for block in data if get_block_type(block) == "start"), data[0])
+    root_id = root_block[0]
+
+    stacks = {}
+    for blocks in group_stacks(data):
+        has_root = any(block[0] == root_id for block in blocks)
+        key = stack_key(blocks, has_root)
+        if key in previous_stacks:
+            stacks[key] = previous_stacks[key]
+        else:
+            stacks[key] = render_stack(blocks, block_map, root_id)
+
+    # Put segments back in the order convert_music_blocks emits them: root first, then project order
+    position = {block[0]: i for i, block in enumerate(data)}
+    segments = sorted(
+        (segment for stack in stacks.values() for segment in stack),
+        key=lambda segment: -1 if segment[0] is None else position[segment[0]]
+    )
+
+    output_lines = ["Start of Project"]
+    for _, lines in segments:
+        output_lines.extend(lines)
+
+    cleaned = [line for line in output_lines if line not in REMOVED_LINES]
+
+    return cleaned, stacks
@@ -16,17 +16,16 @@ general_instructions = """
 16. WORD LIMIT: 30 words per reply, except for summary lines.
 """
 
-def mentor_config(general_instructions, algorithm, mentor_name = "meta"):
-    if mentor_name == "meta":
-        return f"""
+# Prompts are laid out static-first: everything shared by all sessions comes before
+# per-session (algorithm) and per-turn content, so requests share a long identical prefix
+# that the provider can cache. The static parts are built once at import.
+mentor_prompts = {
+    "meta": f"""
         Name: Rohan
         Role: You are Rohan, a mentor on the MusicBlocks platform.
         Goal: Guide users through deep, analytical reflection on their learning experiences and thought processes.
         
-        Algorithm that was parsed from a user's project code by another AI system:
-        {algorithm}
-        
-        Use it while asking questions. Structured Inquiry (in order, skip if already answered):
+        Use the algorithm given at the end while asking questions. Structured Inquiry (in order, skip if already answered):
 
         - What did you do? (ignore if already answered)
         - Why did you do it? (ignore if already answered)
@@ -39,17 +38,13 @@ def mentor_config(general_instructions, algorithm, mentor_name = "meta"):
         
 
 
-        General Guidelines: {general_instructions}"""
-    elif mentor_name == "music":
-        return f"""
+        General Guidelines: {general_instructions}""",
+    "music": f"""
         Name: Ludwig van Beethoven
         Role: You are Beethoven, a reflective music mentor on MusicBlocks.
         Goal: Help users analyze and internalize their music practice by promoting mindful, emotional, and technical self-reflection.
 
-        Algorithm that was parsed from a user's project code by another AI system:
-        {algorithm}
-        
-        Use it while asking questions. Structured Inquiry (in order, skip if already answered):
+        Use the algorithm given at the end while asking questions. Structured Inquiry (in order, skip if already answered):
         - What did you do in your music project? (ignore if already answered)
         - Why did you choose this musical idea or structure? (ignore if already answered)
         - What approach or techniques did you use? Why those?
@@ -59,17 +54,13 @@ def mentor_config(general_instructions, algorithm, mentor_name = "meta"):
         - What did you learn about music theory, structure, or expression?
         - What will you try next? (ignore if already answered)
 
-        General Guidelines: {general_instructions}"""
-    elif mentor_name == "code":
-        return f"""
+        General Guidelines: {general_instructions}""",
+    "code": f"""
         Name: Alan Kay
         Role: You are Alan Kay, a programming mentor in Music Blocks focused on reflective learning and problem-solving analysis.
         Goal: Guide users to understand their decisions in code, identify patterns, and improve future designs.
         
-        Algorithm that was parsed from a user's project code by another AI system:
-        {algorithm}
-        
-        Use it while asking questions. Structured Inquiry (in order, skip if already answered):
+        Use the algorithm given at the end while asking questions. Structured Inquiry (in order, skip if already answered):
         - What problem did you work on today? (ignore if already answered)
         - Why did you choose that algorithm or method?
         - What worked well, and what did not?
@@ -78,12 +69,23 @@ def mentor_config(general_instructions, algorithm, mentor_name = "meta"):
 
         General Guidelines: {general_instructions}
         Usage: Use the user's project code to provide specific feedback and insights."""
-    else:
-        return ""
+}
 
+def mentor_prompt(mentor_name = "meta"):
+    return mentor_prompts.get(mentor_name, "")
 
-def generateAlgorithmPrompt(flowchart, blockInfo):
+def session_prompt(algorithm):
     return f"""
+        Algorithm that was parsed from a user's project code by another AI system:
+        {algorithm}"""
+
+def mentor_config(algorithm, mentor_name = "meta"):
+    if mentor_name not in mentor_prompts:
+        return ""
+    return mentor_prompt(mentor_name) + "\n" + session_prompt(algorithm)
+
+
+algorithm_instructions = """
     You are a helpful mentor who helps students in their reflective learning.
 
     You will receive:
@@ -98,19 +100,21 @@ def generateAlgorithmPrompt(flowchart, blockInfo):
        - Only the guess/question goes in the `response` field.
        - Do not repeat the algorithm here.
 
+    Return structured output matching:
+    - `algorithm`: string containing only the numbered algorithm
+    - `response`: string containing only the guessed use case
+"""
+
+def generateAlgorithmPrompt(flowchart, blockInfo):
+    return f"""{algorithm_instructions}
     Flowchart:
     {flowchart}
 
     Block Information:
     {blockInfo}
-
-    Return structured output matching:
-    - `algorithm`: string containing only the numbered algorithm
-    - `response`: string containing only the guessed use case
     """
 
-def updateAlgorithmPrompt(oldFlowchart, newFlowchart, blockInfo):
-    return f"""
+update_algorithm_instructions = """
     You are a helpful mentor who helps students in their reflective learning.
 
     You will receive:
@@ -127,6 +131,13 @@ def updateAlgorithmPrompt(oldFlowchart, newFlowchart, blockInfo):
         - Only the guess/question goes in the `response` field.
         - Do not repeat the algorithm here.
 
+    Return structured output matching:
+    - `algorithm`: string containing only the numbered algorithm
+    - `response`: string containing only the description of changes
+"""
+
+def updateAlgorithmPrompt(oldFlowchart, newFlowchart, blockInfo):
+    return f"""{update_algorithm_instructions}
     New Flowchart:
     {newFlowchart}
     
@@ -135,14 +146,9 @@ def updateAlgorithmPrompt(oldFlowchart, newFlowchart, blockInfo):
     
     Block Information:
     {blockInfo}
-    
-    Return structured output matching:
-    - `algorithm`: string containing only the numbered algorithm
-    - `response`: string containing only the description of changes
     """
 
-def generateAnalysis(old_summary, conversation):
-    analysis_prompt = f"""
+analysis_instructions = """
     You are an expert reflective coach analyzing a learner's journey. Your task is to deeply analyze these summaries to identify the following:
 
     1. Progress: What areas show clear signs of learning, growth, or improvement?
@@ -154,7 +160,10 @@ def generateAnalysis(old_summary, conversation):
     Present the analysis in clear sections with thoughtful insights.
     Avoid simply repeating what the summaries say - provide higher-level interpretation and reasoning. The user has conversed with another reflective
     agent. Based on their conversation and the previous summary, generate an analysis.
+"""
 
+def generateAnalysis(old_summary, conversation):
+    analysis_prompt = f"""{analysis_instructions}
     Previous Summary:
     {old_summary}
     Chat conversation:
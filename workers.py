@@ -0,0 +1,76 @@
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import config
+from utils.parser import Segments, convert_music_blocks_incremental
+from utils.blocks import findBlockInfo
+from project_store import ParsedProject
+
+# Created on first use so importing main (and forking uvicorn workers) stays cheap
+_process_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+def process_pool() -> ProcessPoolExecutor:
+    """Shared process pool for CPU-bound project parsing."""
+    global _process_pool
+    if _process_pool is None:
+        # forkserver, not fork: by now the server has torch loaded and threads running,
+        # and forking a multithreaded process can deadlock. Workers only import the parser.
+        _process_pool = ProcessPoolExecutor(
+            max_workers=config.PARSE_PROCESSES,
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _process_pool
+
+
+def thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=config.PARSE_THREADS, thread_name_prefix="parse")
+    return _thread_pool
+
+
+def parse_pool() -> Executor:
+    """The pool selected by config.PARSE_EXECUTOR."""
+    if config.PARSE_EXECUTOR == "thread":
+        return thread_pool()
+    if config.PARSE_EXECUTOR == "process":
+        return process_pool()
+    raise ValueError(f"Unknown PARSE_EXECUTOR: {config.PARSE_EXECUTOR}")
+
+
+def parse_job(code: str, project_hash: str, previous_stacks: Optional[Dict[str, Segments]] = None) -> ParsedProject:
+    """Parse a project and collect info on the blocks it uses. Runs inside a pool worker.
+
+    Stacks found unchanged in `previous_stacks` are reused instead of re-rendered.
+    """
+    flowchart, stacks = convert_music_blocks_incremental(json.loads(code), previous_stacks)
+    return ParsedProject(project_hash, flowchart, findBlockInfo(flowchart), stacks)
+
+
+async def parse(code: str, project_hash: str, previous: Optional[ParsedProject] = None) -> ParsedProject:
+    """Parse a project without blocking the event loop.
+
+    Projects smaller than PARSE_INLINE_THRESHOLD characters are parsed inline,
+    since handing them to a pool costs more than the parse itself.
+    """
+    previous_stacks = previous.stacks if previous else None
+    if len(code) < config.PARSE_INLINE_THRESHOLD:
+        return parse_job(code, project_hash, previous_stacks)
+    return await asyncio.get_running_loop().run_in_executor(
+        parse_pool(), parse_job, code, project_hash, previous_stacks
+    )
+
+
+def shutdown():
+    global _process_pool, _thread_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None